@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import xrmocap.utils.triangulation_utils as triangulation_utils
+from xrmocap.utils.triangulation_utils import (
+    parse_keypoints_mask, prepare_triangulate_input,
+)
+
+try:
+    import numba  # noqa: F401
+    has_numba = True
+except (ImportError, ModuleNotFoundError):
+    has_numba = False
+
+
+def test_prepare_triangulate_input():
+    n_view = 6
+    points = np.random.rand(n_view, 2, 17, 3)
+    # fast path returns validated ndarray input untouched
+    ret_points, ret_mask = prepare_triangulate_input(
+        camera_number=n_view, points=points)
+    assert ret_points is points
+    assert ret_mask.shape == (n_view, 2, 17, 1)
+    assert np.all(ret_mask == 1)
+    # the default mask is a read-only broadcast view
+    assert not ret_mask.flags.writeable
+    with pytest.raises(ValueError):
+        ret_mask[0, 0, 0, 0] = 0
+    # an ndarray mask of matching shape passes through unchanged
+    points_mask = np.ones((n_view, 2, 17, 1))
+    _, ret_mask = prepare_triangulate_input(
+        camera_number=n_view, points=points, points_mask=points_mask)
+    assert ret_mask is points_mask
+    # list input still takes the converting path
+    ret_points, ret_mask = prepare_triangulate_input(
+        camera_number=n_view, points=points.tolist())
+    assert isinstance(ret_points, np.ndarray)
+    assert ret_mask.shape == (n_view, 2, 17, 1)
+    # wrong view number still raises
+    with pytest.raises(ValueError):
+        prepare_triangulate_input(
+            camera_number=n_view + 1, points=points)
+
+
+def test_parse_keypoints_mask():
+    n_view = 6
+    n_kps = 17
+    keypoints = np.random.rand(n_view, 2, n_kps, 2)
+    keypoints_mask = np.ones(n_kps)
+    keypoints_mask[3] = 0
+    keypoints_mask[9] = 0
+    # invalid keypoints force a writable copy of the default mask
+    triangulate_mask = parse_keypoints_mask(keypoints, keypoints_mask)
+    assert triangulate_mask.shape == (n_view, 2, n_kps, 1)
+    assert triangulate_mask.flags.writeable
+    assert np.all(np.isnan(triangulate_mask[..., 3, 0]))
+    assert np.all(np.isnan(triangulate_mask[..., 9, 0]))
+    assert np.all(triangulate_mask[..., 5, 0] == 1)
+    # all keypoints valid: the broadcast default mask comes back as is
+    triangulate_mask = parse_keypoints_mask(keypoints, np.ones(n_kps))
+    assert np.all(triangulate_mask == 1)
+
+
+@pytest.mark.skipif(not has_numba, reason='numba has not been installed')
+def test_get_valid_views_stats_numba_parity(monkeypatch):
+    rng = np.random.RandomState(42)
+    for _ in range(10):
+        points_mask = rng.choice(
+            [0.0, 1.0, np.nan], size=(5, 7, 11, 1), p=[0.3, 0.6, 0.1])
+        for return_rate in (False, True):
+            jit_stats, _ = triangulation_utils.get_valid_views_stats(
+                points_mask, concerned_n_view=3, return_rate=return_rate)
+            # force the vectorized numpy fallback on the same input
+            monkeypatch.setattr(triangulation_utils, 'has_numba', False)
+            np_stats, _ = triangulation_utils.get_valid_views_stats(
+                points_mask, concerned_n_view=3, return_rate=return_rate)
+            monkeypatch.setattr(triangulation_utils, 'has_numba', True)
+            assert jit_stats == np_stats
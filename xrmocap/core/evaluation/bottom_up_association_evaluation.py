@@ -153,13 +153,16 @@ class BottomUpAssociationEvaluation(BaseEvaluation):
         # prepare result
         scene_start_idx = 0
         for scene_idx, scene_end_idx in enumerate(end_of_clip_idxs):
-            scene_keypoints = pred_keypoints3d_raw.clone()
-            kps3d = scene_keypoints.get_keypoints()[
-                scene_start_idx:scene_end_idx + 1, ...]
-            mask = scene_keypoints.get_mask()[scene_start_idx:scene_end_idx +
-                                              1, ...]
-            scene_keypoints.set_keypoints(kps3d)
-            scene_keypoints.set_mask(mask)
+            # build the scene Keypoints from slices directly instead of
+            # deep-cloning the whole sequence first
+            scene_keypoints = Keypoints(
+                dtype='numpy',
+                kps=pred_keypoints3d_raw.get_keypoints()[
+                    scene_start_idx:scene_end_idx + 1, ...],
+                mask=pred_keypoints3d_raw.get_mask()[
+                    scene_start_idx:scene_end_idx + 1, ...],
+                convention=pred_keypoints3d_raw.get_convention(),
+                logger=self.logger)
             npz_path = osp.join(self.output_dir,
                                 f'scene{scene_idx}_pred_keypoints3d.npz')
             scene_keypoints.dump(npz_path)
@@ -37,6 +37,7 @@ class End2EndEvaluation(BaseEvaluation):
         gt_kps3d_convention: str = 'coco',
         eval_kps3d_convention: str = 'human_data',
         pick_dict: Union[dict, None] = None,
+        img_normalize: Union[dict, None] = None,
         print_freq: int = 100,
         dataset_visualization: Union[None, dict, BaseDataVisualization] = None,
         logger: Union[None, str, logging.Logger] = None,
@@ -76,6 +77,10 @@ class End2EndEvaluation(BaseEvaluation):
             pick_dict (Union[dict, None], optional):
                 Selected metrics to be printed in the final table.
                 Defaults to None.
+            img_normalize (Union[dict, None], optional):
+                Kwargs (mean and std) of a Normalize transform removed
+                from the dataset pipeline, to be applied on device
+                during validation. Defaults to None.
             print_freq (int, optional):
                 Printing frequencty during model validation. Defaults to 100.
             dataset_visualization (Union[None, dict,
@@ -104,6 +109,7 @@ class End2EndEvaluation(BaseEvaluation):
         self.n_max_person = n_max_person
         self.gt_kps3d_convention = gt_kps3d_convention
         self.checkpoint_select = checkpoint_select
+        self.img_normalize = img_normalize
         self.trans_matrix = np.array(trans_matrix)
 
     def run(self,
@@ -143,15 +149,18 @@ class End2EndEvaluation(BaseEvaluation):
             # e.g. nose, jaw, headtop
             n_frame = len(pred_kps3d_list)
             pred_n_kps = pred_kps3d_list[0].shape[1]
-            pred_kps3d = np.full((n_frame, self.n_max_person, pred_n_kps, 4),
-                                 np.nan)
+            # allocate without the full NaN prefill, only rows left
+            # unwritten by the predictions are filled below
+            pred_kps3d = np.empty((n_frame, self.n_max_person, pred_n_kps, 4))
 
             for frame_idx, per_frame_kps3d in enumerate(pred_kps3d_list):
+                n_valid_person = 0
                 if len(per_frame_kps3d) > 0:
                     n_valid_person, keypoints3d_pred_valid = \
                         convert_result_to_kps([per_frame_kps3d])
                     pred_kps3d[
                         frame_idx, :n_valid_person] = keypoints3d_pred_valid
+                pred_kps3d[frame_idx, n_valid_person:] = np.nan
 
             pred_keypoints3d_raw = Keypoints(
                 dtype='numpy',
@@ -167,9 +176,8 @@ class End2EndEvaluation(BaseEvaluation):
                     for scene_keypoints in self.dataset.gt3d
                 ]))
             gt_n_kps = self.dataset.gt3d[0].get_keypoints_number()
-            gt_kps3d = np.full((self.n_frame, gt_n_person, gt_n_kps, 4),
-                               np.nan)
-            gt_mask = np.full((self.n_frame, gt_n_person, gt_n_kps), np.nan)
+            gt_kps3d = np.empty((self.n_frame, gt_n_person, gt_n_kps, 4))
+            gt_mask = np.empty((self.n_frame, gt_n_person, gt_n_kps))
 
             start_frame = 0
             for gt_keypoints3d_scene in self.dataset.gt3d:
@@ -186,7 +194,12 @@ class End2EndEvaluation(BaseEvaluation):
                     gt_kps3d_scene[:end_frame-start_frame, ...]
                 gt_mask[start_frame:end_frame, :n_person, ...] = \
                     gt_mask_scene[:end_frame-start_frame, ...]
+                gt_kps3d[start_frame:end_frame, n_person:, ...] = np.nan
+                gt_mask[start_frame:end_frame, n_person:, ...] = np.nan
                 start_frame = end_frame
+            # frames not covered by any scene stay invalid
+            gt_kps3d[start_frame:, ...] = np.nan
+            gt_mask[start_frame:, ...] = np.nan
 
             if self.dataset_name == 'panoptic' and \
                     self.trans_matrix is not None:
@@ -271,11 +284,41 @@ class End2EndEvaluation(BaseEvaluation):
         model.eval()
 
         preds = []
+        # keep predictions on GPU and copy them back in chunks,
+        # one synchronous transfer every flush_freq batches
+        pred_buffer = []
+        flush_freq = 16
+
+        def flush_pred_buffer():
+            if len(pred_buffer) > 0:
+                pred_arr = torch.cat(pred_buffer, dim=0).cpu().numpy()
+                preds.extend(pred_arr)
+                pred_buffer.clear()
+
+        # cache .module attribute walks outside the loop
+        grid_size = model.module.grid_size
+        grid_center = model.module.grid_center
+
+        norm_mean, norm_std = None, None
+        if self.img_normalize is not None:
+            device = next(model.parameters()).device
+            norm_mean = torch.tensor(
+                self.img_normalize['mean'], device=device).view(1, -1, 1, 1)
+            norm_std = torch.tensor(
+                self.img_normalize['std'], device=device).view(1, -1, 1, 1)
+
+        n_batches = len(self.test_loader)
+
         with torch.no_grad():
             end = time.time()
             for i, (inputs, meta) in enumerate(self.test_loader):
                 data_time.update(time.time() - end)
                 assert len(inputs) == self.dataset.n_views
+                if norm_mean is not None:
+                    inputs = [
+                        (view.to(norm_mean.device, non_blocking=True) -
+                         norm_mean) / norm_std for view in inputs
+                    ]
                 output = model(views=inputs, meta=meta)
 
                 gt_kps3d = meta[0]['kps3d'].float()
@@ -284,24 +327,23 @@ class End2EndEvaluation(BaseEvaluation):
 
                 src_poses = output['pred_poses']['outputs_coord']. \
                     view(bs, n_queries, n_kps, 3)
-                src_poses = norm2absolute(src_poses, model.module.grid_size,
-                                          model.module.grid_center)
+                src_poses = norm2absolute(src_poses, grid_size, grid_center)
                 score = output['pred_logits'][:, :, 1:2].sigmoid()
                 score = score.unsqueeze(2).expand(-1, -1, n_kps, -1)
                 temp = (score > threshold).float() - 1
 
                 pred = torch.cat([src_poses, temp, score], dim=-1)
-                pred = pred.detach().cpu().numpy()
-                for b in range(pred.shape[0]):
-                    preds.append(pred[b])
+                pred_buffer.append(pred.detach())
+                if len(pred_buffer) >= flush_freq:
+                    flush_pred_buffer()
 
                 batch_time.update(time.time() - end)
                 end = time.time()
-                if (i % self.print_freq == 0 or i
-                        == len(self.test_loader) - 1) and is_main_process():
+                if (i % self.print_freq == 0
+                        or i == n_batches - 1) and is_main_process():
                     gpu_memory_usage = torch.cuda.memory_allocated(0)
                     speed = len(inputs) * inputs[0].size(0) / batch_time.val
-                    msg = f'Test: [{i}/{len(self.test_loader)}]\t' \
+                    msg = f'Test: [{i}/{n_batches}]\t' \
                         f'Time: {batch_time.val:.3f}s ' \
                         f'({batch_time.avg:.3f}s)\t' \
                         f'Speed: {speed:.1f} samples/s\t' \
@@ -310,4 +352,6 @@ class End2EndEvaluation(BaseEvaluation):
                         f'Memory {gpu_memory_usage:.1f}'
                     self.logger.info(msg)
 
+            flush_pred_buffer()
+
         return preds
@@ -1,5 +1,7 @@
 # yapf: disable
 
+import contextlib
+import inspect
 import logging
 import numpy as np
 import os
@@ -19,16 +21,47 @@ from xrmocap.core.evaluation.builder import build_evaluation
 from xrmocap.data.dataset.builder import build_dataset
 from xrmocap.model.architecture.builder import build_architecture
 from xrmocap.utils.distribute_utils import (
-    get_rank, is_main_process, time_synchronized,
+    get_rank, is_dist_avail_and_initialized, is_main_process,
 )
 from xrmocap.utils.mvp_utils import (
-    AverageMeter, get_total_grad_norm, match_name_keywords, norm2absolute,
-    save_checkpoint, set_cudnn,
+    AverageMeter, BatchPrefetcher, get_total_grad_norm, match_name_keywords,
+    norm2absolute, save_checkpoint_async, set_cudnn,
 )
 
 # yapf: enable
 
 
+def pop_normalize_transform(dataset_cfg: dict) -> Union[None, dict]:
+    """Remove the Normalize step from a dataset img_pipeline config.
+
+    Args:
+        dataset_cfg (dict):
+            Dataset config containing an img_pipeline list. The list is
+            replaced by a copy without the Normalize transform.
+
+    Returns:
+        Union[None, dict]:
+            Kwargs of the removed Normalize transform (mean and std),
+            or None if the pipeline has no Normalize step.
+    """
+    img_pipeline = dataset_cfg.get('img_pipeline', None)
+    if img_pipeline is None:
+        return None
+    normalize_cfg = None
+    remaining_pipeline = []
+    for transform in img_pipeline:
+        if isinstance(transform, dict) and \
+                transform.get('type', None) == 'Normalize':
+            normalize_cfg = {
+                k: v
+                for k, v in transform.items() if k != 'type'
+            }
+        else:
+            remaining_pipeline.append(transform)
+    dataset_cfg['img_pipeline'] = remaining_pipeline
+    return normalize_cfg
+
+
 class MVPTrainer():
 
     def __init__(self,
@@ -62,7 +95,13 @@ class MVPTrainer():
                  inference_conf_thr: list = [0.0],
                  print_freq: int = 100,
                  clip_max_norm: float = 0.1,
-                 optimize_backbone: bool = False) -> None:
+                 optimize_backbone: bool = False,
+                 use_amp: bool = True,
+                 accum_steps: int = 1,
+                 persistent_workers: bool = True,
+                 prefetch_factor: int = 4,
+                 use_compile: bool = False,
+                 gpu_normalize: bool = True) -> None:
         """Create a trainer for training the Multi-view Pose Transformer(MVP).
 
         Args:
@@ -115,7 +154,9 @@ class MVPTrainer():
                 Fix random seed between experiments if needed.
                 Defaults to 42.
             workers (int, optional):
-                Number of workers.. Defaults to 4.
+                Number of dataloader workers. If negative, a worker
+                count is inferred from available CPU cores and the
+                number of views. Defaults to 4.
             train_batch_size (int, optional):
                 Batch size in training. Defaults to 1.
             test_batch_size (int, optional):
@@ -135,6 +176,30 @@ class MVPTrainer():
             optimize_backbone (bool, optional):
                 Set it to be True to train the whole model jointly.
                 Defaults to False.
+            use_amp (bool, optional):
+                If automatic mixed precision is used in training.
+                Defaults to True.
+            accum_steps (int, optional):
+                Number of iterations to accumulate gradients
+                before an optimizer step. Gradient all-reduce is
+                skipped on non-stepping iterations. Defaults to 1.
+            persistent_workers (bool, optional):
+                If True, dataloader workers are kept alive across
+                epochs instead of being respawned. Only effective
+                when workers > 0. Defaults to True.
+            prefetch_factor (int, optional):
+                Number of batches loaded in advance by each
+                dataloader worker. Only effective when workers > 0.
+                Defaults to 4.
+            use_compile (bool, optional):
+                If True, the model is optimized with torch.compile
+                for fused transformer kernels. Requires a torch
+                version providing torch.compile. Defaults to False.
+            gpu_normalize (bool, optional):
+                If True, the Normalize step is removed from the
+                dataset img_pipeline and applied on GPU after the
+                batch copy, unloading the dataloader workers.
+                Defaults to True.
         """
 
         self.logger = get_logger(logger)
@@ -165,6 +230,12 @@ class MVPTrainer():
         self.workers = workers
         self.final_output_dir = final_output_dir
         self.optimize_backbone = optimize_backbone
+        self.use_amp = use_amp
+        self.accum_steps = accum_steps
+        self.persistent_workers = persistent_workers
+        self.prefetch_factor = prefetch_factor
+        self.use_compile = use_compile
+        self.gpu_normalize = gpu_normalize
 
         self.cudnn_setup = cudnn_setup
         self.dataset_setup = dataset_setup
@@ -178,56 +249,141 @@ class MVPTrainer():
 
     def get_optimizer(self, model_without_ddp, weight_decay, optim_type):
         lr = self.lr
-        if model_without_ddp.backbone is not None:
-            for params in model_without_ddp.backbone.parameters():
-                # Set it to be True to train the whole model jointly
-                # Default to false to avoid OOM
-                params.requires_grad = self.optimize_backbone
-
         lr_linear_proj_mult = self.lr_linear_proj_mult
         lr_linear_proj_names = ['reference_points', 'sampling_offsets']
+        # partition parameters in a single pass over named_parameters()
+        linear_proj_params = []
+        other_params = []
+        for name, param in model_without_ddp.named_parameters():
+            if not param.requires_grad:
+                continue
+            if match_name_keywords(name, lr_linear_proj_names):
+                linear_proj_params.append(param)
+            else:
+                other_params.append(param)
         param_dicts = [{
-            'params': [
-                p for n, p in model_without_ddp.named_parameters()
-                if not match_name_keywords(n, lr_linear_proj_names)
-                and p.requires_grad
-            ],
-            'lr':
-            lr,
+            'params': other_params,
+            'lr': lr,
         }, {
-            'params': [
-                p for n, p in model_without_ddp.named_parameters()
-                if match_name_keywords(n, lr_linear_proj_names)
-                and p.requires_grad
-            ],
-            'lr':
-            lr * lr_linear_proj_mult,
+            'params': linear_proj_params,
+            'lr': lr * lr_linear_proj_mult,
         }]
 
+        # the fused implementation updates all params of a group in one
+        # kernel instead of one kernel per param, foreach is the
+        # multi-tensor fallback; older torch releases accept neither
+        # kwarg, so only pass what this build understands
+        optim_class = optim.Adam if optim_type == 'adam' else optim.AdamW
+        optim_arg_names = inspect.signature(optim_class.__init__).parameters
+        impl_kwargs = dict()
+        if torch.cuda.is_available() and self.device != 'cpu' \
+                and 'fused' in optim_arg_names:
+            impl_kwargs['fused'] = True
+        elif 'foreach' in optim_arg_names:
+            impl_kwargs['foreach'] = True
+
         if optim_type == 'adam':
-            optimizer = optim.Adam(param_dicts, lr=lr)
+            optimizer = optim.Adam(param_dicts, lr=lr, **impl_kwargs)
         elif optim_type == 'adamw':
-            optimizer = optim.AdamW(param_dicts, lr=lr, weight_decay=1e-4)
+            optimizer = optim.AdamW(
+                param_dicts, lr=lr, weight_decay=1e-4, **impl_kwargs)
 
         return optimizer
 
+    def compile_model(self, model):
+        """Optimize the model with torch.compile when enabled.
+
+        Input shapes are fixed by the config, so dynamic shape tracing
+        is disabled and Inductor can emit static-shape kernels. Returns
+        the model unchanged if use_compile is False or torch.compile is
+        unavailable.
+        """
+        if not self.use_compile:
+            return model
+        if not hasattr(torch, 'compile'):
+            self.logger.warning('use_compile is set but torch.compile is '
+                                'not available, running in eager mode.')
+            return model
+        return torch.compile(model, mode='reduce-overhead', dynamic=False)
+
+    def build_mvp_dataset(self, split_dataset_setup: dict) -> tuple:
+        """Build an MVPDataset from a per-split setup dict.
+
+        The split setup (train or test) is merged with the shared base
+        setup, and the Normalize step is stripped from the pipeline
+        when gpu_normalize is enabled.
+
+        Args:
+            split_dataset_setup (dict):
+                Setup dict of the split, e.g.
+                self.dataset_setup.train_dataset_setup.
+
+        Returns:
+            tuple:
+                dataset:
+                    The built dataset.
+                img_normalize (Union[None, dict]):
+                    Kwargs of the Normalize transform removed from the
+                    pipeline, or None.
+        """
+        dataset_cfg = dict(type='MVPDataset', logger=self.logger)
+        dataset_cfg.update(split_dataset_setup)
+        dataset_cfg.update(self.dataset_setup.base_dataset_setup)
+        img_normalize = None
+        if self.gpu_normalize:
+            # per-pixel normalization moves from the dataloader
+            # workers to the device
+            img_normalize = pop_normalize_transform(dataset_cfg)
+        return build_dataset(dataset_cfg), img_normalize
+
+    def get_auto_workers(self, n_views: int) -> int:
+        """Infer a dataloader worker count from CPU cores and view number.
+
+        Every sample decodes n_views images, so the worker count scales
+        with the view number while always leaving one core for the
+        training loop.
+
+        Args:
+            n_views (int):
+                Number of views per sample.
+
+        Returns:
+            int: Inferred number of dataloader workers.
+        """
+        n_cpu = os.cpu_count() or 1
+        return min(max(n_cpu - 1, 1), max(4, n_views * 2))
+
+    def get_dataloader_kwargs(self) -> dict:
+        """Get common keyword arguments shared by train and test dataloaders.
+
+        persistent_workers and prefetch_factor are only passed when
+        workers > 0, as required by torch.utils.data.DataLoader.
+        """
+        loader_kwargs = dict(num_workers=self.workers, pin_memory=True)
+        if self.workers > 0:
+            loader_kwargs.update(
+                persistent_workers=self.persistent_workers,
+                prefetch_factor=self.prefetch_factor)
+        return loader_kwargs
+
     def train(self):
 
         if is_main_process():
             self.logger.info('Loading data ..')
 
-        train_dataset_cfg = dict(type='MVPDataset', logger=self.logger)
-        train_dataset_cfg.update(self.dataset_setup.train_dataset_setup)
-        train_dataset_cfg.update(self.dataset_setup.base_dataset_setup)
-        train_dataset = build_dataset(train_dataset_cfg)
-
-        test_dataset_cfg = dict(type='MVPDataset', logger=self.logger)
-        test_dataset_cfg.update(self.dataset_setup.test_dataset_setup)
-        test_dataset_cfg.update(self.dataset_setup.base_dataset_setup)
-        test_dataset = build_dataset(test_dataset_cfg)
+        train_dataset, img_normalize = self.build_mvp_dataset(
+            self.dataset_setup.train_dataset_setup)
+        test_dataset, test_img_normalize = self.build_mvp_dataset(
+            self.dataset_setup.test_dataset_setup)
 
         n_views = train_dataset.n_views
 
+        if self.workers < 0:
+            self.workers = self.get_auto_workers(n_views)
+            if is_main_process():
+                self.logger.info(f'Auto-set dataloader workers'
+                                 f' to {self.workers}')
+
         if self.distributed:
             rank, world_size = get_dist_info()
             sampler_train = DistributedSampler(train_dataset)
@@ -243,15 +399,13 @@ class MVPTrainer():
         train_loader = torch.utils.data.DataLoader(
             train_dataset,
             batch_sampler=batch_sampler_train,
-            num_workers=self.workers,
-            pin_memory=True)
+            **self.get_dataloader_kwargs())
 
         test_loader = torch.utils.data.DataLoader(
             test_dataset,
             batch_size=self.test_batch_size,
             sampler=sampler_val,
-            pin_memory=True,
-            num_workers=self.workers)
+            **self.get_dataloader_kwargs())
 
         set_cudnn(self.cudnn_setup.benchmark, self.cudnn_setup.deterministic,
                   self.cudnn_setup.enable)
@@ -270,20 +424,42 @@ class MVPTrainer():
             output_dir=self.final_output_dir,
             logger=self.logger)
         eval_cfg.update(self.evaluation_setup)
+        # evaluation normalizes with the kwargs popped from the test
+        # pipeline, which may differ from the train ones
+        if test_img_normalize is not None:
+            eval_cfg['img_normalize'] = test_img_normalize
         evaluation = build_evaluation(eval_cfg)
 
         model.to(self.device)
+        # NHWC lets cuDNN pick transpose-free conv algorithms
+        # for the image backbone
+        model.to(memory_format=torch.channels_last)
         model.criterion.to(self.device)
 
+        if model.backbone is not None:
+            # Set it to be True to train the whole model jointly
+            # Default to false to avoid OOM
+            # freeze before the DDP wrap, so the reducer never
+            # registers parameters that will not receive gradients
+            model.backbone.requires_grad_(self.optimize_backbone)
+
         model_without_ddp = model
         if self.distributed:
             if is_main_process():
                 self.logger.info('Distributed ..')
+            # the MVP graph is static per config, so the per-iteration
+            # unused-parameter traversal can be skipped; static_graph
+            # breaks the no_sync() accumulation path in the reducer,
+            # so it is only enabled without gradient accumulation
             model = torch.nn.parallel.\
                 DistributedDataParallel(model, device_ids=[self.gpu_idx],
-                                        find_unused_parameters=True)
+                                        find_unused_parameters=False,
+                                        gradient_as_bucket_view=True,
+                                        static_graph=self.accum_steps == 1)
             model_without_ddp = model.module
 
+        model = self.compile_model(model)
+
         optimizer = self.get_optimizer(model_without_ddp, self.weight_decay,
                                        self.optimizer)
 
@@ -345,6 +521,9 @@ class MVPTrainer():
         if is_main_process():
             self.logger.info(f'Number of params: {n_parameters}')
 
+        scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
+
+        checkpoint_thread = None
         for epoch in range(start_epoch, end_epoch):
             current_lr = optimizer.param_groups[0]['lr']
             if is_main_process():
@@ -358,6 +537,9 @@ class MVPTrainer():
                 self.final_output_dir,
                 self.clip_max_norm,
                 self.print_freq,
+                scaler=scaler,
+                accum_steps=self.accum_steps,
+                img_normalize=img_normalize,
                 n_views=n_views,
                 device=self.device)
 
@@ -372,11 +554,15 @@ class MVPTrainer():
                         best_model = True
                     else:
                         best_model = False
+                    # wait for the previous writer before saving to
+                    # the same checkpoint file
+                    if checkpoint_thread is not None:
+                        checkpoint_thread.join()
                     if isinstance(self.lr_decay_epoch, list):
                         self.logger.info(
                             f'saving checkpoint to {self.final_output_dir} '
                             f'(Best: {best_model})')
-                        save_checkpoint(
+                        checkpoint_thread = save_checkpoint_async(
                             {
                                 'epoch': epoch + 1,
                                 'state_dict': model.module.state_dict(),
@@ -388,7 +574,7 @@ class MVPTrainer():
                         self.logger.info(
                             f'saving checkpoint to {self.final_output_dir} '
                             f'(Best: {best_model})')
-                        save_checkpoint(
+                        checkpoint_thread = save_checkpoint_async(
                             {
                                 'epoch': epoch + 1,
                                 'state_dict': model.module.state_dict(),
@@ -398,6 +584,8 @@ class MVPTrainer():
                 dist.barrier()
 
         if is_main_process():
+            if checkpoint_thread is not None:
+                checkpoint_thread.join()
             final_model_state_file = os.path.join(self.final_output_dir,
                                                   'final_state.pth.tar')
             self.logger.info(
@@ -409,10 +597,14 @@ class MVPTrainer():
         if is_main_process():
             self.logger.info('Loading data ..')
 
-        test_dataset_cfg = dict(type='MVPDataset', logger=self.logger)
-        test_dataset_cfg.update(self.dataset_setup.test_dataset_setup)
-        test_dataset_cfg.update(self.dataset_setup.base_dataset_setup)
-        test_dataset = build_dataset(test_dataset_cfg)
+        test_dataset, img_normalize = self.build_mvp_dataset(
+            self.dataset_setup.test_dataset_setup)
+
+        if self.workers < 0:
+            self.workers = self.get_auto_workers(test_dataset.n_views)
+            if is_main_process():
+                self.logger.info(f'Auto-set dataloader workers'
+                                 f' to {self.workers}')
 
         if self.distributed:
             rank, world_size = get_dist_info()
@@ -425,8 +617,7 @@ class MVPTrainer():
             test_dataset,
             batch_size=self.test_batch_size,
             sampler=sampler_val,
-            pin_memory=True,
-            num_workers=self.workers)
+            **self.get_dataloader_kwargs())
 
         set_cudnn(self.cudnn_setup.benchmark, self.cudnn_setup.deterministic,
                   self.cudnn_setup.enable)
@@ -445,14 +636,21 @@ class MVPTrainer():
             output_dir=self.final_output_dir,
             logger=self.logger)
         eval_cfg.update(self.evaluation_setup)
+        if img_normalize is not None:
+            eval_cfg['img_normalize'] = img_normalize
         evaluation = build_evaluation(eval_cfg)
 
         model.to(self.device)
+        model.to(memory_format=torch.channels_last)
         model.criterion.to(self.device)
 
         if self.distributed:
             model = torch.nn.parallel.DistributedDataParallel(
-                model, device_ids=[self.gpu_idx], find_unused_parameters=True)
+                model,
+                device_ids=[self.gpu_idx],
+                find_unused_parameters=False,
+                gradient_as_bucket_view=True,
+                static_graph=True)
 
         if self.model_path is not None:
             if is_main_process():
@@ -476,6 +674,8 @@ class MVPTrainer():
         else:
             raise ValueError('Check the model file for testing!')
 
+        model = self.compile_model(model)
+
         for thr in self.inference_conf_thr:
             evaluation.run(model=model, threshold=thr, is_train=False)
 
@@ -488,6 +688,9 @@ def train_3d(model,
              output_dir: str,
              clip_max_norm: float,
              print_freq: int,
+             scaler: Union[None, torch.cuda.amp.GradScaler] = None,
+             accum_steps: int = 1,
+             img_normalize: Union[None, dict] = None,
              n_views: int = 5,
              device: str = 'cuda'):
     """Train one epoch.
@@ -508,6 +711,17 @@ def train_3d(model,
             Gradient clipping.
         print_freq (int):
             Printing frequency during training.
+        scaler (Union[None, torch.cuda.amp.GradScaler], optional):
+            Gradient scaler for mixed precision training.
+            If None, a disabled scaler will be created and
+            the forward runs in full precision. Defaults to None.
+        accum_steps (int, optional):
+            Number of iterations to accumulate gradients
+            before an optimizer step. Defaults to 1.
+        img_normalize (Union[None, dict], optional):
+            Kwargs (mean and std) of a Normalize transform removed
+            from the dataset pipeline, to be applied on device.
+            Defaults to None.
         n_views (int, optional):
             Number of views. Defaults to 5.
         device (str, optional):
@@ -516,73 +730,140 @@ def train_3d(model,
     logger = get_logger(logger)
     batch_time = AverageMeter()
     data_time = AverageMeter()
-    loss_ce = AverageMeter()
-    class_error = AverageMeter()
-    loss_per_kp = AverageMeter()
-    loss_pose_perprojection = AverageMeter()
-    cardinality_error = AverageMeter()
+    meters = {
+        'loss_ce': AverageMeter(),
+        'class_error': AverageMeter(),
+        'loss_per_kp': AverageMeter(),
+        'loss_pose_perprojection': AverageMeter(),
+        'cardinality_error': AverageMeter(),
+    }
+    meter_keys = None
+    # per-iter loss values stay on GPU and are flushed to the meters
+    # with a single sync at every print step; only the logging rank
+    # buffers them, other ranks would never flush
+    is_logging_rank = is_main_process()
+    loss_buffer = []
 
     model.train()
 
-    if model.module.backbone is not None:
-        # Comment out this line if you want to train 2D backbone jointly
-        model.module.backbone.eval()
+    if scaler is None:
+        scaler = torch.cuda.amp.GradScaler(enabled=False)
+
+    # cache .module attribute walks outside the loop
+    model_without_ddp = model.module
+    grid_size = model_without_ddp.grid_size
+    grid_center = model_without_ddp.grid_center
 
-    end = time.time()
-    for i, (inputs, meta) in enumerate(loader):
+    if model_without_ddp.backbone is not None:
+        # Comment out this line if you want to train 2D backbone jointly
+        model_without_ddp.backbone.eval()
+
+    norm_mean, norm_std = None, None
+    if img_normalize is not None:
+        norm_mean = torch.tensor(
+            img_normalize['mean'], device=device).view(1, -1, 1, 1)
+        norm_std = torch.tensor(
+            img_normalize['std'], device=device).view(1, -1, 1, 1)
+
+    n_batches = len(loader)
+    n_kps = loader.dataset.n_kps
+
+    optimizer.zero_grad()
+    grad_total_norm = 0.0
+    end = time.perf_counter()
+    # batches are copied to device on a side stream, one batch ahead
+    prefetcher = BatchPrefetcher(loader, device=device, channels_last=True)
+    for i, (inputs, meta) in enumerate(prefetcher):
         assert len(inputs) == n_views
-        inputs = [i.to(device) for i in inputs]
-        meta = [{
-            k: v.to(device) if isinstance(v, torch.Tensor) else v
-            for k, v in t.items()
-        } for t in meta]
-        data_time.update(time_synchronized() - end)
-        end = time_synchronized()
+        if norm_mean is not None:
+            inputs = [(view - norm_mean) / norm_std for view in inputs]
+        data_time.update(time.perf_counter() - end)
+        end = time.perf_counter()
 
-        out, loss_dict, losses = model(views=inputs, meta=meta)
+        with torch.cuda.amp.autocast(enabled=scaler.is_enabled()):
+            out, loss_dict, losses = model(views=inputs, meta=meta)
 
-        n_kps = loader.dataset.n_kps
         bs, n_queries = out['pred_logits'].shape[:2]
 
         src_poses = out['pred_poses']['outputs_coord']. \
             view(bs, n_queries, n_kps, 3)
-        src_poses = norm2absolute(src_poses, model.module.grid_size,
-                                  model.module.grid_center)
+        src_poses = norm2absolute(src_poses, grid_size, grid_center)
         score = out['pred_logits'][:, :, 1:2].sigmoid()
         score = score.unsqueeze(2).expand(-1, -1, n_kps, -1)
 
-        loss_ce.update(loss_dict['loss_ce'].sum().item())
-        class_error.update(loss_dict['class_error'].sum().item())
-
-        loss_per_kp.update(loss_dict['loss_per_kp'].sum().item())
-
-        if 'loss_pose_perprojection' in loss_dict:
-            loss_pose_perprojection.update(
-                loss_dict['loss_pose_perprojection'].sum().item())
-
-        cardinality_error.update(loss_dict['cardinality_error'].sum().item())
-
-        if losses > 0:
+        if is_logging_rank:
+            if meter_keys is None:
+                meter_keys = [key for key in meters if key in loss_dict]
+            loss_buffer.append(
+                torch.stack(
+                    [loss_dict[key].sum().detach() for key in meter_keys]))
+
+        do_print = i % print_freq == 0 and is_logging_rank
+
+        skip_backward = not losses > 0
+        if is_dist_avail_and_initialized():
+            # all ranks must agree on skipping, otherwise the
+            # gradient all-reduce hangs on the non-skipping ranks
+            skip_flag = torch.tensor(
+                int(skip_backward), device=losses.device
+                if isinstance(losses, torch.Tensor) else device)
+            dist.all_reduce(skip_flag)
+            skip_backward = skip_flag.item() > 0
+
+        # the last batch always steps, so a trailing window smaller
+        # than accum_steps is not dropped at the end of the epoch
+        is_step_iter = (i + 1) % accum_steps == 0 or (i + 1) == n_batches
+        if not skip_backward:
+            # skip gradient all-reduce on non-stepping iterations
+            sync_ctx = contextlib.nullcontext() \
+                if is_step_iter or not hasattr(model, 'no_sync') \
+                else model.no_sync()
+            with sync_ctx:
+                scaler.scale(losses / accum_steps).backward()
+            if is_step_iter:
+                scaler.unscale_(optimizer)
+                if clip_max_norm > 0:
+                    grad_total_norm = torch.nn.utils.clip_grad_norm_(
+                        model.parameters(), clip_max_norm)
+                elif do_print:
+                    # without clipping the norm is only needed for
+                    # logging, skip the parameter walk otherwise
+                    grad_total_norm = get_total_grad_norm(
+                        model.parameters(), clip_max_norm)
+
+                scaler.step(optimizer)
+                scaler.update()
+                optimizer.zero_grad()
+        elif is_step_iter:
+            # a skipped boundary iteration must not leak this window's
+            # partial gradients into the next window's step
             optimizer.zero_grad()
-            losses.backward()
-            if clip_max_norm > 0:
-                grad_total_norm = torch.nn.utils.clip_grad_norm_(
-                    model.parameters(), clip_max_norm)
-            else:
-                grad_total_norm = get_total_grad_norm(model.parameters(),
-                                                      clip_max_norm)
-
-            optimizer.step()
 
-        batch_time.update(time_synchronized() - end)
-        end = time_synchronized()
+        if do_print and torch.cuda.is_available():
+            # sync only when logging, so the reported iteration time
+            # covers queued GPU work without serializing every step
+            torch.cuda.synchronize()
+        batch_time.update(time.perf_counter() - end)
+        end = time.perf_counter()
+
+        if do_print:
+            # one sync flushes all buffered loss values to the meters
+            for iter_vals in torch.stack(loss_buffer).cpu().tolist():
+                for key, val in zip(meter_keys, iter_vals):
+                    meters[key].update(val)
+            loss_buffer.clear()
+
+            loss_ce = meters['loss_ce']
+            class_error = meters['class_error']
+            loss_per_kp = meters['loss_per_kp']
+            loss_pose_perprojection = meters['loss_pose_perprojection']
+            cardinality_error = meters['cardinality_error']
 
-        if i % print_freq == 0 and is_main_process():
             gpu_memory_usage = torch.cuda.memory_allocated(0)
             speed = len(inputs) * inputs[0].size(0) / batch_time.val
 
             msg = \
-                f'Epoch: [{epoch}][{i}/{len(loader)}]\t' \
+                f'Epoch: [{epoch}][{i}/{n_batches}]\t' \
                 f'Time: {batch_time.val:.3f}s ({batch_time.avg:.3f}s)\t' \
                 f'Speed: {speed:.1f} samples/s\t' \
                 f'Data: {data_time.val:.3f}s ' f'({data_time.avg:.3f}s)\t' \
@@ -1,6 +1,7 @@
 import copy
 import numpy
 import os
+import threading
 import time
 import torch
 import torch.backends.cudnn as cudnn
@@ -31,6 +32,93 @@ class AverageMeter(object):
         self.avg = self.sum / self.count
 
 
+class BatchPrefetcher:
+    """Iterate a dataloader and copy every batch to device ahead of time.
+
+    The copy of batch N+1 runs on a side CUDA stream while batch N is
+    being consumed, overlapping host-to-device transfer with compute.
+    Falls back to plain synchronous copies when CUDA is unavailable.
+    """
+
+    def __init__(self,
+                 loader,
+                 device: Union[torch.device, str] = 'cuda',
+                 channels_last: bool = False) -> None:
+        """
+        Args:
+            loader:
+                A dataloader yielding (inputs, meta) pairs, where inputs
+                is a list of tensors and meta is a list of dicts.
+            device (Union[torch.device, str], optional):
+                Target device of the copies. Defaults to 'cuda'.
+            channels_last (bool, optional):
+                If True, 4-dim input tensors are converted to
+                channels-last memory format after the copy.
+                Defaults to False.
+        """
+        self.loader = loader
+        self.device = torch.device(device)
+        self.channels_last = channels_last
+        self.use_stream = \
+            self.device.type == 'cuda' and torch.cuda.is_available()
+        self.copy_stream = \
+            torch.cuda.Stream(self.device) if self.use_stream else None
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self.loader_iter = iter(self.loader)
+        self.next_batch = None
+        self.preload()
+        return self
+
+    def __next__(self):
+        if self.next_batch is None:
+            raise StopIteration
+        inputs, meta = self.next_batch
+        if self.use_stream:
+            curr_stream = torch.cuda.current_stream(self.device)
+            curr_stream.wait_stream(self.copy_stream)
+            for tensor in inputs:
+                tensor.record_stream(curr_stream)
+            for meta_dict in meta:
+                for value in meta_dict.values():
+                    if isinstance(value, torch.Tensor):
+                        value.record_stream(curr_stream)
+        self.preload()
+        return inputs, meta
+
+    def preload(self):
+        """Fetch the next batch from the dataloader and start its copy."""
+        try:
+            inputs, meta = next(self.loader_iter)
+        except StopIteration:
+            self.next_batch = None
+            return
+        if self.use_stream:
+            with torch.cuda.stream(self.copy_stream):
+                self.next_batch = self.copy_to_device(inputs, meta)
+        else:
+            self.next_batch = self.copy_to_device(inputs, meta)
+
+    def copy_to_device(self, inputs, meta):
+        inputs = [
+            tensor.to(self.device, non_blocking=True) for tensor in inputs
+        ]
+        if self.channels_last:
+            inputs = [
+                tensor.contiguous(memory_format=torch.channels_last)
+                if tensor.dim() == 4 else tensor for tensor in inputs
+            ]
+        meta = [{
+            k: v.to(self.device, non_blocking=True)
+            if isinstance(v, torch.Tensor) else v
+            for k, v in meta_dict.items()
+        } for meta_dict in meta]
+        return inputs, meta
+
+
 def match_name_keywords(n, name_keywords):
     """Match the keys in two dictionaries."""
     for b in name_keywords:
@@ -99,6 +187,44 @@ def save_checkpoint(states,
                    os.path.join(output_dir, 'model_best.pth.tar'))
 
 
+def copy_states_to_cpu(states):
+    """Recursively copy all tensors in a nested checkpoint dict to CPU.
+
+    Every tensor is detached and copied, so the returned structure is
+    safe to serialize while training keeps mutating the originals.
+    """
+    if isinstance(states, torch.Tensor):
+        return states.detach().to('cpu', copy=True)
+    if isinstance(states, dict):
+        return {k: copy_states_to_cpu(v) for k, v in states.items()}
+    if isinstance(states, (list, tuple)):
+        return type(states)(copy_states_to_cpu(v) for v in states)
+    return states
+
+
+def save_checkpoint_async(states,
+                          is_best,
+                          output_dir,
+                          filename='checkpoint.pth.tar'):
+    """Save a checkpoint in a background thread.
+
+    Tensors are copied to CPU before the thread starts, so
+    serialization and disk I/O run off the training critical path.
+
+    Returns:
+        threading.Thread:
+            The started writer thread. join() it before saving to the
+            same file again or exiting the process.
+    """
+    states = copy_states_to_cpu(states)
+    thread = threading.Thread(
+        target=save_checkpoint,
+        args=(states, is_best, output_dir, filename),
+        daemon=True)
+    thread.start()
+    return thread
+
+
 @torch.no_grad()
 def accuracy(output, target, topk=(1, )):
     """Computes the precision@k for the specified values of k."""
@@ -4,6 +4,54 @@ import prettytable
 from typing import Tuple, Union
 from xrprimer.utils.log_utils import get_logger
 
+try:
+    from numba import njit
+    has_numba = True
+except (ImportError, ModuleNotFoundError):
+    has_numba = False
+
+if has_numba:
+
+    @njit(cache=True)
+    def _count_valid_views_kernel(mask: np.ndarray,
+                                  concerned_n_view: int) -> Tuple:
+        """Fused single-pass kernel behind get_valid_views_stats().
+
+        Args:
+            mask (np.ndarray):
+                An ndarray of mask, in shape [n_view, n_pair].
+            concerned_n_view (int):
+                If a point's valid view number is no greater than
+                concerned_n_view, it will be counted.
+
+        Returns:
+            Tuple:
+                counts(np.ndarray):
+                    Pair count per valid view number,
+                    in shape [concerned_n_view].
+                total_pairs(int):
+                    Number of pairs not marked by nan.
+        """
+        n_view, n_pair = mask.shape
+        counts = np.zeros(concerned_n_view, dtype=np.int64)
+        total_pairs = 0
+        for pair_idx in range(n_pair):
+            has_nan = False
+            n_valid_views = 0
+            for view_idx in range(n_view):
+                value = mask[view_idx, pair_idx]
+                if np.isnan(value):
+                    has_nan = True
+                    break
+                if value == 1.0:
+                    n_valid_views += 1
+            if has_nan:
+                continue
+            total_pairs += 1
+            if n_valid_views < concerned_n_view:
+                counts[n_valid_views] += 1
+        return counts, total_pairs
+
 
 def __init_valid_views_dict__(concerned_n_view: int = 3) -> dict:
     """Create a dict for valid view number statistics。
@@ -55,20 +103,22 @@ def get_valid_views_stats(points_mask: np.ndarray,
     # init valid count
     valid_stats_dict = __init_valid_views_dict__(
         concerned_n_view=concerned_n_view)
-    total_pairs = points_mask.shape[1]
-    for point_index in range(total_pairs):
-        pair_data = points_mask[:, point_index, 0]
-        nan_data = pair_data[np.isnan(pair_data)]
-        # if marked by nan, skip
-        if len(nan_data) > 0:
-            total_pairs -= 1
-            continue
-        valid_mask = (pair_data == 1.0)
-        # check how many valid views in one data pair
-        n_valid = int(np.sum(valid_mask, axis=0))
+    mask = points_mask[..., 0].reshape(points_mask.shape[0], -1)
+    if has_numba:
+        # fused jit kernel, no intermediate arrays
+        counts, total_pairs = _count_valid_views_kernel(
+            np.ascontiguousarray(mask, dtype=np.float64), concerned_n_view)
+    else:
+        # if marked by nan in any view, skip the whole pair
+        nan_pairs = np.isnan(mask).any(axis=0)
+        # count valid views of every remaining pair in one pass
+        n_valid_views = np.sum(mask == 1.0, axis=0)[~nan_pairs]
+        total_pairs = int(n_valid_views.size)
         # if critical, count it
-        if n_valid in valid_stats_dict.keys():
-            valid_stats_dict[n_valid] += 1.0
+        counts = np.bincount(
+            n_valid_views.astype(np.int64), minlength=concerned_n_view)
+    for n_view in range(concerned_n_view):
+        valid_stats_dict[n_view] = float(counts[n_view])
     # get ratio if required
     if return_rate and total_pairs > 0.0:
         for key in valid_stats_dict.keys():
@@ -125,8 +175,23 @@ def prepare_triangulate_input(
     Returns:
         Tuple[np.ndarray, np.ndarray]:
             points and points_mask in type ndarray.
+            If points_mask is None, the returned default mask
+            is a read-only broadcast view of a single one,
+            copy it before writing.
     """
     logger = get_logger(logger)
+    # fast path for the hot case: inputs are already ndarrays of
+    # matching shapes, skip conversions and shape fix-ups
+    if isinstance(points, np.ndarray) \
+            and points.shape[0] == camera_number \
+            and points.shape[-1] >= 2:
+        if points_mask is None:
+            return points, np.broadcast_to(
+                np.array(1.0, dtype=points.dtype),
+                points.shape[:-1] + (1, ))
+        if isinstance(points_mask, np.ndarray) \
+                and points_mask.shape == points.shape[:-1] + (1, ):
+            return points, points_mask
     if isinstance(points, list) or isinstance(points, tuple):
         points = np.asarray(points)
     # check points type
@@ -135,7 +200,10 @@ def prepare_triangulate_input(
                      f'Type: {type(points)}.')
         raise TypeError
     if points_mask is None:
-        points_mask = np.ones_like(points[..., 0:1])
+        # all-ones default mask as a zero-copy broadcast view,
+        # callers writing into it have to copy first
+        points_mask = np.broadcast_to(
+            np.array(1.0, dtype=points.dtype), points.shape[:-1] + (1, ))
     elif isinstance(points_mask, list) or isinstance(points_mask, tuple):
         points_mask = np.asarray(points_mask)
     # check points_mask type
@@ -200,21 +268,26 @@ def parse_keypoints_mask(
     Returns:
         np.ndarray:
             triangulate_mask for points selection and
-            triangulation.
+            triangulation. When every keypoint is valid this
+            is the read-only broadcast default mask,
+            copy it before writing.
     """
     logger = get_logger(logger)
     keypoints, triangulate_mask = prepare_triangulate_input(
         camera_number=keypoints.shape[0], points=keypoints, logger=logger)
-    init_points_mask_shape = triangulate_mask.shape
     if keypoints.shape[-2] != keypoints_mask.shape[0]:
         logger.error('Keypoints number of points does not' +
                      ' match length of keypoints_mask.\n' +
                      f'keypoints.shape: {keypoints.shape}' +
                      f'keypoints_mask.shape: {keypoints_mask.shape}')
         raise ValueError
-    nan_indexes = np.where(keypoints_mask == 0)
-    triangulate_mask = triangulate_mask.reshape(-1, init_points_mask_shape[-2],
-                                                init_points_mask_shape[-1])
-    triangulate_mask[:, nan_indexes[0], :] = np.nan
-    triangulate_mask = triangulate_mask.reshape(*init_points_mask_shape)
+    # mark invalid keypoints across all leading dims in one indexed
+    # assignment, no reshape round trip
+    kps_invalid = np.asarray(keypoints_mask) == 0
+    if kps_invalid.any():
+        # the default mask is a read-only broadcast view,
+        # copy before writing nan into it
+        if not triangulate_mask.flags.writeable:
+            triangulate_mask = np.array(triangulate_mask)
+        triangulate_mask[..., kps_invalid, :] = np.nan
     return triangulate_mask
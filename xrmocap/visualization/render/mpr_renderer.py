@@ -1,5 +1,4 @@
 # yapf: disable
-import cv2
 import numpy as np
 import torch
 from typing import Union
@@ -116,19 +115,100 @@ class MPRNormRenderer:
                 'Vertices and faces are not at the same device!' +
                 f'vertices: {vertices.device}\nfaces: {self.faces.device}')
             raise ValueError
-        vertices = vertices.clone().detach()
+        # half precision input is upcast before projection,
+        # mpr kernels expect the camera dtype
+        vertices = vertices.detach().to(self.r_tensor.dtype)
         vertices = vertices @ self.r_tensor.transpose(0, 1) + self.t_tensor
+        return self.rasterize_single_frame(vertices, background)
+
+    def forward_batched(self,
+                        vertices: torch.Tensor,
+                        backgrounds: Union[None, np.ndarray] = None,
+                        out: Union[None, np.ndarray] = None) -> np.ndarray:
+        """Render a batch of frames sharing the same faces.
+
+        The camera transform is applied to the whole batch in a single
+        matmul, rasterization is dispatched per frame and composed
+        directly into the output buffer.
+
+        Args:
+            vertices (torch.Tensor):
+                Vertice location for self.faces, in shape
+                [n_frame, n_vert, 3].
+            backgrounds (Union[None, np.ndarray]):
+                Image array for backgrounds in shape [n_frame, h, w, 3].
+                If None, use black.
+                Defaults to None.
+            out (Union[None, np.ndarray]):
+                Pre-allocated output buffer in shape
+                [n_frame, h, w, 3], dtype uint8.
+                If None, a new array is allocated.
+                Defaults to None.
+
+        Raises:
+            ValueError: Vertices and faces are not at the same device.
+
+        Returns:
+            np.ndarray:
+                Image array in shape [n_frame, h, w, 3].
+        """
+        if not vertices.device == self.faces.device:
+            self.logger.error(
+                'Vertices and faces are not at the same device!' +
+                f'vertices: {vertices.device}\nfaces: {self.faces.device}')
+            raise ValueError
+        # half precision input is upcast before projection,
+        # mpr kernels expect the camera dtype
+        vertices = vertices.detach().to(self.r_tensor.dtype)
+        vertices = vertices @ self.r_tensor.transpose(0, 1) + self.t_tensor
+        if out is None:
+            out = np.empty((vertices.shape[0], self.camera_parameter.height,
+                            self.camera_parameter.width, 3),
+                           dtype=np.uint8)
+        for frame_idx in range(vertices.shape[0]):
+            background = backgrounds[frame_idx] \
+                if backgrounds is not None else None
+            self.rasterize_single_frame(
+                vertices[frame_idx], background, out=out[frame_idx])
+        return out
+
+    def rasterize_single_frame(
+            self,
+            vertices: torch.Tensor,
+            background: Union[None, np.ndarray] = None,
+            out: Union[None, np.ndarray] = None) -> np.ndarray:
+        """Rasterize one frame of camera-space vertices.
+
+        Args:
+            vertices (torch.Tensor):
+                Camera-space vertice location for self.faces,
+                in shape [n_vert, 3].
+            background (Union[None, np.ndarray]):
+                Image array for background in shape [h, w, 3].
+                If None, use black.
+                Defaults to None.
+            out (Union[None, np.ndarray]):
+                Pre-allocated output buffer in shape [h, w, 3],
+                dtype uint8. If None, a new array is allocated.
+                Defaults to None.
+
+        Returns:
+            np.ndarray:
+                Image array in shape [h, w, 3].
+        """
         coords, normals = mpr.estimate_normals(
             vertices=vertices, faces=self.faces, pinhole=self.mpr_pinhole2d)
         vis_normals_cpu = mpr.vis_normals(coords, normals)
+        if out is None:
+            out = np.empty((*vis_normals_cpu.shape, 3), dtype=np.uint8)
         if background is not None:
-            mask = coords[:, :, [2]] <= 0
-            mask = mask.detach().cpu().numpy()
-            ret_img = vis_normals_cpu[:, :, None] +\
-                background * mask
+            # slicing keeps the comparison on a view and the bool
+            # result is already a fresh tensor, nothing to detach
+            mask = (coords[:, :, 2:] <= 0).cpu().numpy()
+            # compose straight into the output buffer
+            np.multiply(background, mask, out=out)
+            out += vis_normals_cpu[:, :, None]
         else:
             # convert gray to 3 channel img
-            ret_img = cv2.merge([
-                vis_normals_cpu,
-            ] * 3)
-        return ret_img
+            out[:] = vis_normals_cpu[:, :, None]
+        return out
@@ -3,13 +3,16 @@ import cv2
 import math
 import numpy as np
 import os
+import queue
+import threading
 import torch
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from typing import List, Union
 from xrprimer.data_structure.camera import (
     FisheyeCameraParameter, PinholeCameraParameter,
 )
-from xrprimer.utils.ffmpeg_utils import VideoWriter, video_to_array
+from xrprimer.utils.ffmpeg_utils import VideoWriter
 from xrprimer.utils.log_utils import get_logger, logging
 from xrprimer.utils.path_utils import (
     Existence, check_path_existence, check_path_suffix,
@@ -86,11 +89,6 @@ def visualize_smpl_data(
         device (Union[torch.device, str], optional):
             A specified device. Defaults to 'cuda'.
 
-    Raises:
-        NotImplementedError:
-            Function images_to_video() in
-            the latest xrprimer release is not correct.
-
     Returns:
         Union[np.ndarray, None]:
             Plotted multi-frame image array or None.
@@ -129,15 +127,16 @@ def visualize_smpl_data(
     n_person = len(smpl_data_list)
 
     # prepare faces for multi-person
-    sperson_faces = default_body_model.faces_tensor.clone().detach()
+    # faces are static topology, build the multi-person buffer on CPU
+    # once and let the renderer upload it to the device in one copy
+    sperson_faces = default_body_model.faces_tensor.detach().cpu()
     sperson_n_verts = default_body_model.get_num_verts()
-    mperson_faces = None
-    for person_idx in range(n_person):
-        new_faces = sperson_faces + sperson_n_verts * person_idx
-        if mperson_faces is None:
-            mperson_faces = new_faces
-        else:
-            mperson_faces = torch.cat((mperson_faces, new_faces), dim=0)
+    # build every per-person index buffer in one broadcast add instead
+    # of growing mperson_faces with repeated torch.cat
+    person_offsets = torch.arange(
+        n_person, dtype=sperson_faces.dtype).view(-1, 1, 1) * sperson_n_verts
+    mperson_faces = (sperson_faces.unsqueeze(0) +
+                     person_offsets).reshape(-1, 3).contiguous()
     renderer = MPRNormRenderer(
         faces=mperson_faces,
         camera_parameter=cam_param,
@@ -150,89 +149,171 @@ def visualize_smpl_data(
         xrprimer_video_writer = VideoWriter(
             output_path, [cam_param.height, cam_param.width])
 
+    # person visibility masks for the whole sequence, in shape
+    # [data_len, n_person, 1, 1], applied as one multiply per window
+    person_mask_list = []
+    for person_idx in range(n_person):
+        person_mask_list.append(
+            torch.as_tensor(
+                smpl_data_list[person_idx].get_mask(),
+                dtype=torch.float16,
+                device=device))
+    person_masks = torch.stack(
+        person_mask_list, dim=1).view(data_len, n_person, 1, 1)
+    # frames with every person masked out render as pure background,
+    # decided once here on CPU so the frame loop never syncs the device
+    nonempty_frames = (person_masks.view(data_len, n_person).sum(dim=1) >
+                       0).cpu().numpy()
+
     total_iter = math.ceil(data_len / batch_size)
     curr_iter = 0
-    file_names_cache = None
-    output_img_list = []
+    file_paths_cache = None
+    # batches consume background frames strictly in order, one
+    # sequential reader avoids re-seeking the video every batch
+    background_reader = None
+    if background_video is not None:
+        background_reader = cv2.VideoCapture(background_video)
+    # PNG compression is CPU-bound, offload image writes to worker
+    # threads so rendering the next batch is not blocked on disk
+    img_write_queue = None
+    img_write_threads = []
+    if write_img:
+        img_write_queue = queue.Queue(maxsize=32)
+
+        def img_write_worker() -> None:
+            while True:
+                queue_item = img_write_queue.get()
+                if queue_item is None:
+                    break
+                file_path, img_to_write = queue_item
+                cv2.imwrite(filename=file_path, img=img_to_write)
+                img_write_queue.task_done()
+
+        for _ in range(4):
+            img_write_thread = threading.Thread(
+                target=img_write_worker, daemon=True)
+            img_write_thread.start()
+            img_write_threads.append(img_write_thread)
+    # frames are streamed to disk batch by batch, only return_array
+    # needs the full sequence in RAM, pre-allocated once
+    output_img_arr = None
+    if return_array:
+        output_img_arr = np.empty(
+            (data_len, cam_param.height, cam_param.width, 3), dtype=np.uint8)
     while (curr_iter < total_iter):
 
-        mperson_verts = None
         start_idx = curr_iter * batch_size
         end_idx = min(data_len, start_idx + batch_size)
+        n_batch = end_idx - start_idx
+        # group persons by gender so every body model
+        # runs a single batched forward
+        gender_person_idxs = dict()
         for person_idx in range(n_person):
-            smpl_data = smpl_data_list[person_idx]
-            param_dict = smpl_data.to_tensor_dict(device=device)
-            param_dict_input = dict()
-            for key, value in param_dict.items():
-                param_dict_input[key] = value[start_idx:end_idx, :]
-
-            model = body_model_dict[smpl_data['gender']]
+            gender = smpl_data_list[person_idx]['gender']
+            gender_person_idxs.setdefault(gender, []).append(person_idx)
+        sperson_verts_list = [None] * n_person
+        for gender, person_idxs in gender_person_idxs.items():
+            stacked_param_dict = dict()
+            for person_idx in person_idxs:
+                smpl_data = smpl_data_list[person_idx]
+                param_dict = smpl_data.to_tensor_dict(device=device)
+                for key, value in param_dict.items():
+                    stacked_param_dict.setdefault(key, []).append(
+                        value[start_idx:end_idx, :])
+            param_dict_input = {
+                key: torch.cat(value_list, dim=0)
+                for key, value_list in stacked_param_dict.items()
+            }
+            model = body_model_dict[gender]
             with torch.no_grad():
                 body_model_output = model(**param_dict_input)
-            verts = body_model_output['vertices']  # n_batch, n_verts, 3
-            sperson_verts = torch.unsqueeze(verts, dim=1)
-            # sperson_verts.shape: n_batch, n_person, n_verts, 3
-            if mperson_verts is None:
-                mperson_verts = sperson_verts
-            else:
-                mperson_verts = torch.cat((mperson_verts, sperson_verts),
-                                          dim=1)
+            # verts.shape: n_person_of_gender x n_batch, n_verts, 3
+            # keep the window buffer in half precision, it halves
+            # vertex memory and bandwidth; the renderer upcasts
+            # before projection
+            verts = body_model_output['vertices'].to(torch.float16)
+            verts = verts.view(len(person_idxs), n_batch, *verts.shape[1:])
+            for group_idx, person_idx in enumerate(person_idxs):
+                sperson_verts_list[person_idx] = verts[group_idx]
+        # mperson_verts.shape: n_batch, n_person, n_verts, 3
+        mperson_verts = torch.stack(sperson_verts_list, dim=1)
 
         if background_arr is not None:
-            background_arr_batch = background_arr[start_idx:end_idx].copy()
+            # the renderer never writes into backgrounds,
+            # a view of the input array is enough
+            background_arr_batch = background_arr[start_idx:end_idx]
         elif background_dir is not None:
-            file_names_cache = file_names_cache \
-                if file_names_cache is not None \
-                else sorted(os.listdir(background_dir))
-            file_names_batch = file_names_cache[start_idx:end_idx]
-            background_list_batch = []
-            for file_name in file_names_batch:
-                background_list_batch.append(
-                    np.expand_dims(
-                        cv2.imread(os.path.join(background_dir, file_name)),
-                        axis=0))
-            background_arr_batch = np.concatenate(
-                background_list_batch, axis=0)
+            # list the dir and join paths only once, later batches
+            # just slice the cached list
+            file_paths_cache = file_paths_cache \
+                if file_paths_cache is not None \
+                else [
+                    os.path.join(background_dir, file_name)
+                    for file_name in sorted(os.listdir(background_dir))
+                ]
+            file_paths_batch = file_paths_cache[start_idx:end_idx]
+            # cv2.imread releases the GIL while decoding,
+            # so threads overlap disk I/O and decode
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                background_list_batch = list(
+                    executor.map(cv2.imread, file_paths_batch))
+            background_arr_batch = np.stack(background_list_batch, axis=0)
         elif background_video is not None:
-            background_arr_batch = video_to_array(
-                background_video, start=start_idx, end=end_idx)
+            background_list_batch = []
+            for _ in range(n_batch):
+                read_success, img = background_reader.read()
+                if not read_success:
+                    logger.error('Failed to read frame' +
+                                 f' {start_idx + len(background_list_batch)}' +
+                                 f' from {background_video}.')
+                    raise ValueError
+                background_list_batch.append(img)
+            background_arr_batch = np.stack(background_list_batch, axis=0)
         else:
             background_arr_batch = np.zeros(
                 (end_idx - start_idx, cam_param.height, cam_param.width, 3),
                 dtype=np.uint8)
-        batch_results = []
-
-        iter_batch_len = min(data_len - start_idx, batch_size)
-        for frame_idx in tqdm(range(0, iter_batch_len), disable=disable_tqdm):
-            sframe_mperson_verts = mperson_verts[frame_idx]
-            sframe_background = background_arr_batch[frame_idx]
-            for person_idx in range(n_person):
-                mask_value = smpl_data_list[person_idx].get_mask()[frame_idx]
-                sframe_mperson_verts[person_idx] *= mask_value
-            if sframe_mperson_verts.square().sum() > 0:
-                img = renderer(
-                    vertices=sframe_mperson_verts.reshape(-1, 3),
-                    background=sframe_background)
+        # apply all person masks of the window in one in-place op and
+        # flatten persons into a single vertex buffer right away, so
+        # the render call below needs no further reshape
+        mperson_verts.mul_(person_masks[start_idx:end_idx])
+        mperson_verts = mperson_verts.view(n_batch, -1, 3)
+        # render all frames with any visible person in one batched call
+        nonempty = nonempty_frames[start_idx:end_idx]
+        nonempty_idxs = np.nonzero(nonempty)[0].tolist()
+        rendered_imgs = None
+        if len(nonempty_idxs) > 0:
+            rendered_imgs = renderer.forward_batched(
+                vertices=mperson_verts[nonempty_idxs],
+                backgrounds=background_arr_batch[nonempty_idxs])
+
+        rendered_count = 0
+        for frame_idx in tqdm(range(0, n_batch), disable=disable_tqdm):
+            if nonempty[frame_idx]:
+                img = rendered_imgs[rendered_count]
+                rendered_count += 1
             else:
-                img = sframe_background
+                img = background_arr_batch[frame_idx]
 
             if write_img:
-                cv2.imwrite(
-                    filename=os.path.join(output_path,
-                                          f'{frame_idx + start_idx:06d}.png'),
-                    img=img)
+                img_write_queue.put(
+                    (os.path.join(output_path,
+                                  f'{frame_idx + start_idx:06d}.png'), img))
             if write_video:
                 xrprimer_video_writer.write(image_array=img)
-            batch_results.append(img)
+            if return_array:
+                output_img_arr[start_idx + frame_idx] = img
         curr_iter += 1
-        if return_array:
-            output_img_list += batch_results
-
-    # return None
-    if return_array:
-        img_arr = np.asarray(output_img_list)
+    if background_reader is not None:
+        background_reader.release()
+    if write_img:
+        img_write_queue.join()
+        for _ in img_write_threads:
+            img_write_queue.put(None)
+        for img_write_thread in img_write_threads:
+            img_write_thread.join()
 
-    return img_arr if return_array else None
+    return output_img_arr if return_array else None
 
 
 def _check_output_path(output_path: str, overwrite: bool,